@@ -1,16 +1,18 @@
 """Main FastAPI application entry point."""
 
+import asyncio
 import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import ORJSONResponse, Response
 
 from backend.config import get_settings
 from backend.models.database import init_db
-from backend.models.schemas import HealthResponse
+from backend.models.schemas import HealthResponse, HealthServices
 from backend.routers import chat, documents, timeline
+from backend.services.document_processor import get_document_processor
 
 
 @asynccontextmanager
@@ -22,28 +24,45 @@ async def lifespan(app: FastAPI):
     # Create upload directory if it doesn't exist
     os.makedirs(settings.upload_dir, exist_ok=True)
 
+    # Remove uploads left pending by a previous run that were never saved
+    await asyncio.to_thread(get_document_processor().sweep_pending_dir)
+
     # Initialize database
     await init_db()
 
+    # Health payload is static for the lifetime of the process
+    app.state.health = HealthResponse(
+        status="healthy",
+        version="1.0.0",
+        services=HealthServices(
+            database="postgresql",
+            vector_store="pgvector",
+            claude_model=settings.claude_model,
+            embedding_model=settings.embedding_model,
+        ),
+    )
+
     yield
 
-    # Shutdown (cleanup tasks would go here)
+    # Shutdown
+    get_document_processor().shutdown()
 
 
 app = FastAPI(
     title="Knowledge Management Chatbot",
     description="A document-centric chatbot with RAG capabilities",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan,
 )
 
 # CORS middleware for frontend
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=get_settings().cors_origins,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "DELETE"],
+    allow_headers=["content-type", "authorization"],
 )
 
 # Include routers
@@ -55,39 +74,39 @@ app.include_router(timeline.router, prefix="/api", tags=["Timeline"])
 @app.get("/api/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint."""
-    settings = get_settings()
-    return HealthResponse(
-        status="healthy",
-        version="1.0.0",
-        services={
-            "database": "postgresql",
-            "vector_store": "pgvector",
-            "claude_model": settings.claude_model,
-            "embedding_model": settings.embedding_model,
-        },
-    )
+    return app.state.health
 
 
 # Serve static frontend files
-app.mount("/static", StaticFiles(directory="frontend"), name="static")
+frontend_files = StaticFiles(directory="frontend")
+app.mount("/static", frontend_files, name="static")
+
+PAGE_CACHE_CONTROL = "public, max-age=300"
+
+
+async def _serve_page(request: Request, filename: str) -> Response:
+    """Serve an HTML page through StaticFiles for ETag/304 handling."""
+    response = await frontend_files.get_response(filename, request.scope)
+    response.headers["Cache-Control"] = PAGE_CACHE_CONTROL
+    return response
 
 
 @app.get("/")
-async def serve_frontend():
+async def serve_frontend(request: Request):
     """Serve the main chat page."""
-    return FileResponse("frontend/index.html")
+    return await _serve_page(request, "index.html")
 
 
 @app.get("/documents")
-async def serve_documents_page():
+async def serve_documents_page(request: Request):
     """Serve the documents management page."""
-    return FileResponse("frontend/documents.html")
+    return await _serve_page(request, "documents.html")
 
 
 @app.get("/timeline")
-async def serve_timeline_page():
+async def serve_timeline_page(request: Request):
     """Serve the timeline page."""
-    return FileResponse("frontend/timeline.html")
+    return await _serve_page(request, "timeline.html")
 
 
 if __name__ == "__main__":
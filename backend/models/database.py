@@ -1,14 +1,14 @@
 """SQLAlchemy database models and session management."""
 
-import uuid
-from datetime import datetime
+from functools import lru_cache
 from typing import AsyncGenerator
 
-from pgvector.sqlalchemy import Vector
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, text
+from pgvector.sqlalchemy import HALFVEC
+from sqlalchemy import BigInteger, Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Index, text
 from sqlalchemy.dialects.postgresql import ARRAY, UUID
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase, relationship
+from sqlalchemy.sql import func
 
 from backend.config import get_settings
 
@@ -23,6 +23,7 @@ class Document(Base):
     """Represents a document stored in the knowledge base."""
 
     __tablename__ = "documents"
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String(255), nullable=False)
@@ -34,18 +35,24 @@ class Document(Base):
     chunk_count = Column(Integer, default=0)
     is_indexed = Column(Boolean, default=False)
     stored_file_path = Column(String(500))  # Path to original file for download
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
-    # Relationships
+    # Relationships. Children are removed by ON DELETE CASCADE (passive_deletes),
+    # and doc_metadata must be eager-loaded explicitly rather than lazy-loaded.
     doc_metadata = relationship(
-        "DocumentMetadata", back_populates="document", uselist=False, cascade="all, delete-orphan"
+        "DocumentMetadata",
+        back_populates="document",
+        uselist=False,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise",
     )
     timeline_events = relationship(
-        "TimelineEvent", back_populates="document", cascade="all, delete-orphan"
+        "TimelineEvent", back_populates="document", cascade="all, delete-orphan", passive_deletes=True
     )
     chunks = relationship(
-        "DocumentChunk", back_populates="document", cascade="all, delete-orphan"
+        "DocumentChunk", back_populates="document", cascade="all, delete-orphan", passive_deletes=True
     )
 
     def __repr__(self):
@@ -74,11 +81,11 @@ class DocumentMetadata(Base):
     date_range_end = Column(DateTime)
     date_uncertain = Column(Boolean, default=False)  # Triggers user prompt
 
-    # Extracted entities (JSON arrays)
-    companies = Column(Text)  # ["Acme Corp"]
-    people = Column(Text)  # ["Sarah Chen", "David Kim"]
+    # Extracted entities
+    companies = Column(ARRAY(String), default=list)  # ["Acme Corp"]
+    people = Column(ARRAY(String), default=list)  # ["Sarah Chen", "David Kim"]
 
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationship
     document = relationship("Document", back_populates="doc_metadata")
@@ -91,6 +98,10 @@ class TimelineEvent(Base):
     """Extracted timeline event from a document."""
 
     __tablename__ = "timeline_events"
+    __table_args__ = (
+        Index("ix_timeline_companies_gin", "companies", postgresql_using="gin"),
+        Index("ix_timeline_people_gin", "people", postgresql_using="gin"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     document_id = Column(
@@ -102,11 +113,11 @@ class TimelineEvent(Base):
     title = Column(String(500), nullable=False)
     description = Column(Text)
 
-    # Entity associations (JSON arrays)
-    companies = Column(Text)
-    people = Column(Text)
+    # Entity associations
+    companies = Column(ARRAY(String), default=list)
+    people = Column(ARRAY(String), default=list)
 
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationship
     document = relationship("Document", back_populates="timeline_events")
@@ -119,13 +130,19 @@ class Conversation(Base):
     """Represents a chat conversation session."""
 
     __tablename__ = "conversations"
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(BigInteger, primary_key=True, index=True)
     title = Column(String(255), default="New Conversation")
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    messages = relationship(
+        "Message",
+        back_populates="conversation",
+        cascade="all, delete-orphan",
+        order_by="[Message.created_at, Message.id]",
+    )
 
     def __repr__(self):
         return f"<Conversation(id={self.id}, title='{self.title}')>"
@@ -135,13 +152,14 @@ class Message(Base):
     """Represents a single message in a conversation."""
 
     __tablename__ = "messages"
+    __table_args__ = (Index("ix_messages_conv_created", "conversation_id", "created_at"),)
 
-    id = Column(Integer, primary_key=True, index=True)
-    conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
+    id = Column(BigInteger, primary_key=True, index=True)
+    conversation_id = Column(BigInteger, ForeignKey("conversations.id"), nullable=False)
     role = Column(String(20), nullable=False)  # 'user' or 'assistant'
     content = Column(Text, nullable=False)
     sources = Column(Text)  # JSON string of source documents used
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     conversation = relationship("Conversation", back_populates="messages")
 
@@ -153,10 +171,30 @@ class DocumentChunk(Base):
     """Vector embedding chunk for a document (replaces Qdrant)."""
 
     __tablename__ = "document_chunks"
+    __table_args__ = (
+        Index("ix_chunks_doc_chunkidx", "document_id", "chunk_index"),
+        Index("ix_chunks_date", "chunk_date"),
+        # Trigram index so verbatim substring (ILIKE) lookups avoid a full scan
+        Index(
+            "ix_chunks_text_trgm",
+            "text",
+            postgresql_using="gin",
+            postgresql_ops={"text": "gin_trgm_ops"},
+        ),
+        # HNSW index for approximate nearest-neighbour search on embeddings.
+        # Embeddings are unit length, so inner product ranks like cosine.
+        Index(
+            "ix_chunks_embedding_hnsw_ip",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "halfvec_ip_ops"},
+        ),
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     document_id = Column(
-        Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True
+        Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False
     )
 
     # Chunk content
@@ -164,8 +202,9 @@ class DocumentChunk(Base):
     chunk_index = Column(Integer, nullable=False)
     text = Column(Text, nullable=False)
 
-    # Vector embedding (384 dimensions for all-MiniLM-L6-v2)
-    embedding = Column(Vector(384), nullable=False)
+    # Unit-normalized vector embedding (384 dimensions for all-MiniLM-L6-v2),
+    # stored as half precision
+    embedding = Column(HALFVEC(384), nullable=False)
 
     # Time-aware metadata (previously in Qdrant payload)
     chunk_date = Column(DateTime, nullable=True)
@@ -174,7 +213,7 @@ class DocumentChunk(Base):
     companies = Column(ARRAY(String), default=[])
     people = Column(ARRAY(String), default=[])
 
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationship
     document = relationship("Document", back_populates="chunks")
@@ -183,24 +222,207 @@ class DocumentChunk(Base):
         return f"<DocumentChunk(id={self.id}, document_id={self.document_id}, chunk_index={self.chunk_index})>"
 
 
-# Database engine and session setup
-settings = get_settings()
-engine = create_async_engine(settings.database_url, echo=False)
-async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+# Database engine and session setup (created lazily on first use)
+@lru_cache(maxsize=1)
+def get_engine() -> AsyncEngine:
+    """Get the shared async engine."""
+    settings = get_settings()
+    return create_async_engine(
+        settings.database_url,
+        echo=False,
+        pool_size=settings.database_pool_size,
+        max_overflow=settings.database_max_overflow,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    """Get the shared session factory bound to the engine."""
+    return async_sessionmaker(get_engine(), class_=AsyncSession, expire_on_commit=False)
+
+
+def _create_missing_indexes(conn) -> None:
+    """Create indexes that were added after their table already existed."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _schema_object_names() -> list[str]:
+    """Names of every table and index defined on the models."""
+    names = []
+    for table in Base.metadata.sorted_tables:
+        names.append(table.name)
+        names.extend(index.name for index in table.indexes)
+    return names
+
+
+async def _schema_is_current(engine: AsyncEngine) -> bool:
+    """Check in one catalog query whether all tables and indexes exist."""
+    names = _schema_object_names()
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            text(
+                "SELECT count(*) FROM pg_class "
+                "WHERE relnamespace = 'public'::regnamespace AND relname = ANY(:names)"
+            ),
+            {"names": names},
+        )
+        return result.scalar() == len(names)
+
+
+async def _column_definitions(conn) -> dict[tuple[str, str], tuple[str, str | None]]:
+    """Map (table, column) to the column's SQL type and default expression."""
+    result = await conn.execute(
+        text(
+            "SELECT c.relname, a.attname, format_type(a.atttypid, a.atttypmod), "
+            "pg_get_expr(d.adbin, d.adrelid) "
+            "FROM pg_attribute a "
+            "JOIN pg_class c ON c.oid = a.attrelid "
+            "LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum "
+            "WHERE c.relnamespace = 'public'::regnamespace AND c.relname = ANY(:tables) "
+            "AND a.attnum > 0 AND NOT a.attisdropped"
+        ),
+        {"tables": [table.name for table in Base.metadata.sorted_tables]},
+    )
+    return {(table, column): (column_type, default) for table, column, column_type, default in result}
+
+
+async def _migrate_timestamp_columns(conn, columns: dict) -> None:
+    """Give timestamps created before server-side defaults a timestamptz type and now() default."""
+    # Older databases have naive UTC timestamps filled in by Python and no
+    # column default, so rows inserted now would get NULL
+    for table in Base.metadata.sorted_tables:
+        for column in table.columns:
+            if not (isinstance(column.type, DateTime) and column.type.timezone and column.server_default is not None):
+                continue
+            column_type, default = columns[(table.name, column.name)]
+            if column_type == "timestamp without time zone":
+                await conn.execute(
+                    text(
+                        f"ALTER TABLE {table.name} "
+                        f"ALTER COLUMN {column.name} TYPE timestamptz USING {column.name} AT TIME ZONE 'UTC', "
+                        f"ALTER COLUMN {column.name} SET DEFAULT now()"
+                    )
+                )
+            elif default is None:
+                await conn.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {column.name} SET DEFAULT now()"))
+            else:
+                continue
+            # Rows written while the default was missing have no timestamp
+            await conn.execute(text(f"UPDATE {table.name} SET {column.name} = now() WHERE {column.name} IS NULL"))
+
+
+async def _migrate_key_columns(conn, columns: dict) -> None:
+    """Widen integer keys declared BIGINT and add the database-generated chunk id."""
+    for table in Base.metadata.sorted_tables:
+        for column in table.columns:
+            if isinstance(column.type, BigInteger) and columns[(table.name, column.name)][0] == "integer":
+                await conn.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {column.name} TYPE bigint"))
+                # A serial key's sequence is integer-typed too and would cap it
+                result = await conn.execute(
+                    text("SELECT pg_get_serial_sequence(:table, :column)"),
+                    {"table": table.name, "column": column.name},
+                )
+                sequence = result.scalar()
+                if sequence is not None:
+                    await conn.execute(text(f"ALTER SEQUENCE {sequence} AS bigint"))
+
+    # Chunk ids used to come from uuid.uuid4() in Python; inserts now omit them
+    if columns[("document_chunks", "id")][1] is None:
+        await conn.execute(
+            text("ALTER TABLE document_chunks ALTER COLUMN id SET DEFAULT gen_random_uuid()")
+        )
+
+
+async def _migrate_entity_columns(conn, columns: dict) -> None:
+    """Convert companies/people stored as JSON text into text arrays."""
+    pending = [
+        (table.name, column.name)
+        for table in Base.metadata.sorted_tables
+        for column in table.columns
+        if isinstance(column.type, ARRAY) and columns[(table.name, column.name)][0] == "text"
+    ]
+    if not pending:
+        return
+
+    # ALTER ... USING cannot contain a subquery, so the JSON unpacking lives in
+    # a session-local function. NULL, blank and non-array values become '{}'.
+    await conn.execute(
+        text(
+            "CREATE FUNCTION pg_temp.json_text_array(value text) RETURNS varchar[] "
+            "LANGUAGE sql IMMUTABLE AS $$ "
+            "SELECT CASE "
+            "WHEN nullif(btrim(value), '') IS NULL THEN '{}'::varchar[] "
+            "WHEN json_typeof(value::json) = 'array' "
+            "THEN ARRAY(SELECT json_array_elements_text(value::json))::varchar[] "
+            "ELSE '{}'::varchar[] END $$"
+        )
+    )
+    for table, column in pending:
+        await conn.execute(
+            text(
+                f"ALTER TABLE {table} ALTER COLUMN {column} "
+                f"TYPE varchar[] USING pg_temp.json_text_array({column})"
+            )
+        )
+    await conn.execute(text("DROP FUNCTION pg_temp.json_text_array(text)"))
+
+
+async def _migrate_embedding_column(conn) -> None:
+    """Bring embeddings stored before unit-length halfvec storage up to date."""
+    # Inner-product search assumes unit-length rows. Older databases hold raw
+    # vector(384) embeddings; databases without the inner-product index have
+    # never been normalized.
+    result = await conn.execute(
+        text(
+            "SELECT format_type(atttypid, atttypmod), to_regclass('ix_chunks_embedding_hnsw_ip') "
+            "FROM pg_attribute "
+            "WHERE attrelid = 'document_chunks'::regclass AND attname = 'embedding'"
+        )
+    )
+    column_type, ip_index = result.one()
+    if column_type == "vector(384)":
+        await conn.execute(
+            text(
+                "ALTER TABLE document_chunks ALTER COLUMN embedding "
+                "TYPE halfvec(384) USING l2_normalize(embedding)::halfvec(384)"
+            )
+        )
+    elif ip_index is None:
+        await conn.execute(text("UPDATE document_chunks SET embedding = l2_normalize(embedding)"))
 
 
 async def init_db():
     """Initialize the database with pgvector extension and all tables."""
+    engine = get_engine()
+
+    # Warm restarts: skip the DDL entirely when the schema is already in place
+    if await _schema_is_current(engine):
+        return
+
     async with engine.begin() as conn:
         # Enable pgvector extension
         await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        # Enable trigram matching for the chunk text index
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         # Create all tables
         await conn.run_sync(Base.metadata.create_all)
+        # create_all leaves existing columns alone; bring older ones up to date
+        columns = await _column_definitions(conn)
+        await _migrate_timestamp_columns(conn, columns)
+        await _migrate_key_columns(conn, columns)
+        # Must precede index creation: the GIN indexes need array columns
+        await _migrate_entity_columns(conn, columns)
+        # Must precede index creation: the HNSW index uses halfvec operators
+        await _migrate_embedding_column(conn)
+        # create_all skips existing tables along with their indexes
+        await conn.run_sync(_create_missing_indexes)
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Dependency that provides a database session."""
-    async with async_session_maker() as session:
+    async with get_sessionmaker()() as session:
         try:
             yield session
         finally:
@@ -3,7 +3,7 @@
 from datetime import datetime
 from enum import Enum
 from typing import Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class MessageRole(str, Enum):
@@ -140,6 +140,8 @@ class DocumentSaveRequest(BaseModel):
 class DocumentResponse(BaseModel):
     """Response representing a document in the knowledge base."""
 
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     filename: str
     original_filename: str
@@ -163,9 +165,6 @@ class DocumentResponse(BaseModel):
         False, description="True if frontend should prompt for date"
     )
 
-    class Config:
-        from_attributes = True
-
 
 class DocumentListResponse(BaseModel):
     """Response containing a list of documents."""
@@ -182,6 +181,8 @@ class DocumentListResponse(BaseModel):
 class TimelineEventResponse(BaseModel):
     """Response representing a timeline event."""
 
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     document_id: int
     event_date: datetime
@@ -192,9 +193,6 @@ class TimelineEventResponse(BaseModel):
     people: list[str] = Field(default_factory=list)
     document_filename: str  # For display
 
-    class Config:
-        from_attributes = True
-
 
 class TimelineResponse(BaseModel):
     """Response containing timeline events."""
@@ -211,9 +209,18 @@ class CompaniesListResponse(BaseModel):
     companies: list[str]
 
 
+class HealthServices(BaseModel):
+    """Backing services reported by the health check."""
+
+    database: str
+    vector_store: str
+    claude_model: str
+    embedding_model: str
+
+
 class HealthResponse(BaseModel):
     """Health check response."""
 
     status: str
     version: str
-    services: dict[str, str]
+    services: HealthServices
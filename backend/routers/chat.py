@@ -1,6 +1,7 @@
 """Chat API endpoints."""
 
 from fastapi import APIRouter, Depends, HTTPException
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
@@ -10,6 +11,9 @@ from backend.services.chat_service import get_chat_service
 
 router = APIRouter()
 
+# Validates the whole sources list in a single pass
+_SOURCES_ADAPTER = TypeAdapter(list[SourceDocument])
+
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
@@ -19,29 +23,31 @@ async def chat(
     """Send a message and get a response."""
     chat_service = get_chat_service()
 
-    # Get or create conversation
+    # Get or create conversation, loading its history in the same query.
+    # Only the columns needed for the history are selected (no ORM objects);
+    # id breaks ties between messages saved in the same transaction.
     if request.conversation_id:
         result = await db.execute(
-            select(Conversation).where(Conversation.id == request.conversation_id)
+            select(Conversation.id, Message.role, Message.content)
+            .outerjoin(Message, Message.conversation_id == Conversation.id)
+            .where(Conversation.id == request.conversation_id)
+            .order_by(Message.created_at, Message.id)
         )
-        conversation = result.scalar_one_or_none()
-        if not conversation:
+        rows = result.all()
+        if not rows:
             raise HTTPException(status_code=404, detail="Conversation not found")
+        conversation_id = rows[0].id
+        history = [
+            {"role": role, "content": content}
+            for _, role, content in rows
+            if role is not None
+        ]
     else:
         conversation = Conversation()
         db.add(conversation)
         await db.flush()
-
-    # Get conversation history
-    history = []
-    if request.conversation_id:
-        result = await db.execute(
-            select(Message)
-            .where(Message.conversation_id == conversation.id)
-            .order_by(Message.created_at)
-        )
-        for msg in result.scalars():
-            history.append({"role": msg.role, "content": msg.content})
+        conversation_id = conversation.id
+        history = []
 
     # Get response from chat service
     response = await chat_service.chat(
@@ -52,12 +58,12 @@ async def chat(
 
     # Save messages to database
     user_msg = Message(
-        conversation_id=conversation.id,
+        conversation_id=conversation_id,
         role="user",
         content=request.message,
     )
     assistant_msg = Message(
-        conversation_id=conversation.id,
+        conversation_id=conversation_id,
         role="assistant",
         content=response["message"],
     )
@@ -67,6 +73,6 @@ async def chat(
 
     return ChatResponse(
         message=response["message"],
-        conversation_id=conversation.id,
-        sources=[SourceDocument(**s) for s in response["sources"]],
+        conversation_id=conversation_id,
+        sources=_SOURCES_ADAPTER.validate_python(response["sources"]),
     )
@@ -1,15 +1,14 @@
 """Document management API endpoints."""
 
-import json
+import asyncio
 import os
-from datetime import datetime
 from pathlib import Path
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import insert, select
+from sqlalchemy.orm import raiseload, selectinload
 
 from backend.models.database import get_db, Document, DocumentMetadata, TimelineEvent
 from backend.models.schemas import (
@@ -21,23 +20,49 @@ from backend.models.schemas import (
 from backend.services.document_processor import get_document_processor
 from backend.services.knowledge_base import get_knowledge_base_service
 from backend.services.document_intelligence import get_document_intelligence_service
+from backend.services.semantic_cache import get_semantic_cache
 from backend.config import get_settings
+from backend.utils.dates import parse_iso_date
 
 router = APIRouter()
 
 
-def _parse_date(date_str: str | None) -> datetime | None:
-    """Parse ISO date string to datetime."""
-    if not date_str:
-        return None
-    try:
-        return datetime.fromisoformat(date_str)
-    except (ValueError, TypeError):
+def _store_original_file(
+    upload_dir: str, upload_id: str, filename: str, content_path: str | None
+) -> str | None:
+    """Move the pending upload into its own directory and return the path."""
+    if not content_path:
         return None
 
+    # Create unique directory for this upload
+    file_dir = Path(upload_dir) / upload_id
+    file_dir.mkdir(parents=True, exist_ok=True)
+
+    file_path = file_dir / filename
+    if os.path.exists(content_path):
+        os.replace(content_path, file_path)
+    return str(file_path) if file_path.exists() else None
+
 
-def _build_document_response(doc: Document) -> DocumentResponse:
+def _cleanup_stored_file(path: str) -> None:
+    """Remove a stored original file and its directory if left empty."""
+    try:
+        os.remove(path)
+        # Also remove the directory if empty
+        parent_dir = Path(path).parent
+        if parent_dir.exists() and not any(parent_dir.iterdir()):
+            parent_dir.rmdir()
+    except OSError:
+        pass  # Ignore file deletion errors (including a file that is already gone)
+
+
+def _build_document_response(
+    doc: Document, metadata: DocumentMetadata | None = None
+) -> DocumentResponse:
     """Build DocumentResponse from Document with metadata."""
+    if metadata is None:
+        metadata = doc.doc_metadata
+
     response_data = {
         "id": doc.id,
         "filename": doc.filename,
@@ -52,16 +77,16 @@ def _build_document_response(doc: Document) -> DocumentResponse:
     }
 
     # Add metadata fields if available
-    if doc.doc_metadata:
+    if metadata:
         response_data.update({
-            "generated_name": doc.doc_metadata.generated_name,
-            "summary": doc.doc_metadata.summary,
-            "document_type": doc.doc_metadata.document_type,
-            "primary_date": doc.doc_metadata.primary_date,
-            "companies": json.loads(doc.doc_metadata.companies) if doc.doc_metadata.companies else [],
-            "people": json.loads(doc.doc_metadata.people) if doc.doc_metadata.people else [],
-            "is_timeless": doc.doc_metadata.is_timeless,
-            "needs_date_input": doc.doc_metadata.date_uncertain,
+            "generated_name": metadata.generated_name,
+            "summary": metadata.summary,
+            "document_type": metadata.document_type,
+            "primary_date": metadata.primary_date,
+            "companies": metadata.companies or [],
+            "people": metadata.people or [],
+            "is_timeless": metadata.is_timeless,
+            "needs_date_input": metadata.date_uncertain,
         })
 
     return DocumentResponse(**response_data)
@@ -78,8 +103,9 @@ async def upload_document(file: UploadFile = File(...)):
             detail=f"Unsupported file type. Supported: {list(processor.SUPPORTED_TYPES.keys())}",
         )
 
-    content = await file.read()
-    result = await processor.process_upload(content, file.filename)
+    # UploadFile is already spooled to a temporary file by Starlette; stream it
+    # straight to the processor instead of reading it into memory
+    result = await processor.process_upload_stream(file.file, file.filename)
 
     return DocumentUploadResponse(
         upload_id=result["upload_id"],
@@ -103,107 +129,107 @@ async def save_document(
     intelligence = get_document_intelligence_service()
     settings = get_settings()
 
-    temp_file = processor.get_temp_file(request.upload_id)
-    if not temp_file:
-        raise HTTPException(status_code=404, detail="Upload not found. Please upload the document again.")
-
-    # Step 1: LLM Metadata Extraction
-    extraction = await intelligence.extract_document_metadata(temp_file["full_text"])
-
-    # Override with user-provided date if given
-    if request.user_provided_date:
-        extraction.primary_date = request.user_provided_date.strftime("%Y-%m-%d")
-        extraction.date_uncertain = False
-
-    # Step 2: Determine filename
-    final_filename = request.custom_name or extraction.suggested_name or temp_file["filename"]
-
-    # Step 3: Store original file for download
-    stored_file_path = None
-    if "content" in temp_file and temp_file["content"]:
-        upload_dir = Path(settings.upload_dir)
-        upload_dir.mkdir(parents=True, exist_ok=True)
-
-        # Create unique directory for this upload
-        file_dir = upload_dir / request.upload_id
-        file_dir.mkdir(parents=True, exist_ok=True)
-
-        # Save the original file
-        file_path = file_dir / temp_file["filename"]
-        with open(file_path, "wb") as f:
-            f.write(temp_file["content"])
-        stored_file_path = str(file_path)
-
-    # Step 4: Create Document record
-    doc = Document(
-        filename=final_filename,
-        original_filename=temp_file["filename"],
-        file_type=temp_file["file_type"],
-        file_size=temp_file["file_size"],
-        content_preview=temp_file["preview"],
-        full_text=temp_file["full_text"],
-        stored_file_path=stored_file_path,
-    )
-    db.add(doc)
-    await db.flush()
-
-    # Step 5: Create DocumentMetadata record
-    metadata = DocumentMetadata(
-        document_id=doc.id,
-        generated_name=extraction.suggested_name,
-        summary=extraction.summary,
-        document_type=extraction.document_type.value,
-        is_timeless=extraction.is_timeless,
-        primary_date=_parse_date(extraction.primary_date),
-        date_range_start=_parse_date(extraction.date_range_start),
-        date_range_end=_parse_date(extraction.date_range_end),
-        date_uncertain=extraction.date_uncertain,
-        companies=json.dumps(extraction.companies),
-        people=json.dumps(extraction.people),
-    )
-    db.add(metadata)
-
-    # Step 6: Create TimelineEvent records
-    for event in extraction.events:
-        event_date = _parse_date(event.date)
-        if event_date:
-            timeline_event = TimelineEvent(
-                document_id=doc.id,
-                event_date=event_date,
-                event_type=event.event_type,
-                title=event.title,
-                description=event.description,
-                companies=json.dumps(event.companies),
-                people=json.dumps(event.people),
-            )
-            db.add(timeline_event)
-
-    # Step 7: Index with time-aware chunks in PostgreSQL (pgvector)
-    chunk_count = await kb.index_document_with_metadata(
-        document_id=doc.id,
-        filename=doc.filename,
-        text=temp_file["full_text"],
-        extraction=extraction,
-        db=db,
-    )
+    # Hold the upload so TTL expiry cannot delete its files mid-save
+    with processor.saving_temp_file(request.upload_id) as temp_file:
+        if not temp_file:
+            raise HTTPException(status_code=404, detail="Upload not found. Please upload the document again.")
+        try:
+            full_text = await processor.read_temp_text(temp_file)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Upload not found. Please upload the document again.")
+
+        # Steps 1 and 2 are independent: move the original file into storage for
+        # download in a worker thread, and chunk and embed the text, while the LLM
+        # metadata extraction is in flight
+        extraction, stored_file_path, embedded = await asyncio.gather(
+            intelligence.extract_document_metadata(full_text),
+            asyncio.to_thread(
+                _store_original_file,
+                settings.upload_dir,
+                request.upload_id,
+                temp_file["filename"],
+                temp_file.get("content_path"),
+            ),
+            kb.embed_document(full_text, pre_cleaned=True),
+        )
+
+        # Override with user-provided date if given
+        if request.user_provided_date:
+            extraction.primary_date = request.user_provided_date.strftime("%Y-%m-%d")
+            extraction.date_uncertain = False
+
+        # Step 3: Determine filename
+        final_filename = request.custom_name or extraction.suggested_name or temp_file["filename"]
+
+        # Step 4: Create Document record
+        doc = Document(
+            filename=final_filename,
+            original_filename=temp_file["filename"],
+            file_type=temp_file["file_type"],
+            file_size=temp_file["file_size"],
+            content_preview=temp_file["preview"],
+            full_text=full_text,
+            stored_file_path=stored_file_path,
+        )
+        db.add(doc)
+        await db.flush()
+
+        # Step 5: Create DocumentMetadata record
+        metadata = DocumentMetadata(
+            document_id=doc.id,
+            generated_name=extraction.suggested_name,
+            summary=extraction.summary,
+            document_type=extraction.document_type.value,
+            is_timeless=extraction.is_timeless,
+            primary_date=parse_iso_date(extraction.primary_date),
+            date_range_start=parse_iso_date(extraction.date_range_start),
+            date_range_end=parse_iso_date(extraction.date_range_end),
+            date_uncertain=extraction.date_uncertain,
+            companies=extraction.companies,
+            people=extraction.people,
+        )
+        db.add(metadata)
+
+        # Step 6: Create TimelineEvent records in a single bulk INSERT
+        event_rows = [
+            {
+                "document_id": doc.id,
+                "event_date": event_date,
+                "event_type": event.event_type,
+                "title": event.title,
+                "description": event.description,
+                "companies": event.companies,
+                "people": event.people,
+            }
+            for event in extraction.events
+            if (event_date := parse_iso_date(event.date))
+        ]
+        if event_rows:
+            await db.execute(insert(TimelineEvent), event_rows)
+
+        # Step 7: Index with time-aware chunks in PostgreSQL (pgvector)
+        chunk_count = await kb.index_document_with_metadata(
+            document_id=doc.id,
+            filename=doc.filename,
+            text=full_text,
+            extraction=extraction,
+            db=db,
+            embedded=embedded,
+        )
 
-    doc.chunk_count = chunk_count
-    doc.is_indexed = True
+        doc.chunk_count = chunk_count
+        doc.is_indexed = True
 
-    await db.commit()
+        await db.commit()
 
-    # Refresh with relationships
-    result = await db.execute(
-        select(Document)
-        .where(Document.id == doc.id)
-        .options(selectinload(Document.doc_metadata))
-    )
-    doc = result.scalar_one()
+        # Cached chat answers may now be missing this document
+        get_semantic_cache().clear()
 
-    # Clean up temp file (but keep stored file)
-    processor.remove_temp_file(request.upload_id)
+        # Clean up temp file (but keep stored file)
+        processor.remove_temp_file(request.upload_id)
 
-    return _build_document_response(doc)
+        # Both objects are already in memory; no need to re-select them
+        return _build_document_response(doc, metadata)
 
 
 @router.get("/documents", response_model=DocumentListResponse)
@@ -211,7 +237,7 @@ async def list_documents(db: AsyncSession = Depends(get_db)):
     """List all documents in the knowledge base."""
     result = await db.execute(
         select(Document)
-        .options(selectinload(Document.doc_metadata))
+        .options(selectinload(Document.doc_metadata), raiseload("*"))
         .order_by(Document.created_at.desc())
     )
     documents = result.scalars().all()
@@ -228,7 +254,7 @@ async def get_document(document_id: int, db: AsyncSession = Depends(get_db)):
     result = await db.execute(
         select(Document)
         .where(Document.id == document_id)
-        .options(selectinload(Document.doc_metadata))
+        .options(selectinload(Document.doc_metadata), raiseload("*"))
     )
     doc = result.scalar_one_or_none()
 
@@ -247,13 +273,21 @@ async def download_document(document_id: int, db: AsyncSession = Depends(get_db)
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    if not doc.stored_file_path or not os.path.exists(doc.stored_file_path):
+    if not doc.stored_file_path:
+        raise HTTPException(status_code=404, detail="Original file not available for download")
+
+    # Stat off the event loop; passing the result also spares FileResponse
+    # from doing its own stat when the response is sent
+    try:
+        stat_result = await asyncio.to_thread(os.stat, doc.stored_file_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Original file not available for download")
 
     return FileResponse(
         path=doc.stored_file_path,
         filename=doc.original_filename,
-        media_type="application/octet-stream",
+        media_type=doc.file_type or "application/octet-stream",
+        stat_result=stat_result,
     )
 
 
@@ -266,23 +300,18 @@ async def delete_document(document_id: int, db: AsyncSession = Depends(get_db)):
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    # Remove from vector store
+    # Remove from vector store while the stored file is deleted in a worker thread
     kb = get_knowledge_base_service()
-    await kb.delete_document(document_id, db=db)
-
-    # Remove stored file if exists
-    if doc.stored_file_path and os.path.exists(doc.stored_file_path):
-        try:
-            os.remove(doc.stored_file_path)
-            # Also remove the directory if empty
-            parent_dir = Path(doc.stored_file_path).parent
-            if parent_dir.exists() and not any(parent_dir.iterdir()):
-                parent_dir.rmdir()
-        except OSError:
-            pass  # Ignore file deletion errors
+    pending = [kb.delete_document(document_id, db=db)]
+    if doc.stored_file_path:
+        pending.append(asyncio.to_thread(_cleanup_stored_file, doc.stored_file_path))
+    await asyncio.gather(*pending)
 
     # Remove from database (cascades to metadata and timeline_events)
     await db.delete(doc)
     await db.commit()
 
+    # Cached chat answers may cite the deleted document
+    get_semantic_cache().clear()
+
     return {"message": f"Document '{doc.filename}' deleted successfully"}
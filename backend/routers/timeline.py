@@ -1,10 +1,10 @@
 """Timeline API endpoints."""
 
-import json
 from datetime import datetime
 from typing import Optional
 
 from fastapi import APIRouter, Depends, Query
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_
 
@@ -13,6 +13,9 @@ from backend.models.schemas import TimelineResponse, TimelineEventResponse, Comp
 
 router = APIRouter()
 
+# Validates a page of timeline events in a single pass
+_EVENTS_ADAPTER = TypeAdapter(list[TimelineEventResponse])
+
 
 @router.get("/timeline", response_model=TimelineResponse)
 async def get_timeline(
@@ -26,9 +29,20 @@ async def get_timeline(
     offset: int = Query(0),
 ):
     """Get timeline events with optional filters."""
-    # Build query with join to get document filename
+    # Date range covers all events, not just the filtered ones
+    min_date_expr = select(func.min(TimelineEvent.event_date)).correlate(None).scalar_subquery()
+    max_date_expr = select(func.max(TimelineEvent.event_date)).correlate(None).scalar_subquery()
+
+    # Build query with join to get document filename. The filtered total and
+    # date range ride along on every row so one round-trip serves the page.
     query = (
-        select(TimelineEvent, Document.filename)
+        select(
+            TimelineEvent,
+            Document.filename,
+            func.count().over().label("total_count"),
+            min_date_expr.label("min_date"),
+            max_date_expr.label("max_date"),
+        )
         .join(Document, TimelineEvent.document_id == Document.id)
     )
 
@@ -42,10 +56,10 @@ async def get_timeline(
     if event_type:
         conditions.append(TimelineEvent.event_type == event_type)
     if company:
-        # JSON contains search - look for company in JSON array
-        conditions.append(TimelineEvent.companies.contains(f'"{company}"'))
+        # Array containment (@>) so the GIN index can be used
+        conditions.append(TimelineEvent.companies.contains([company]))
     if person:
-        conditions.append(TimelineEvent.people.contains(f'"{person}"'))
+        conditions.append(TimelineEvent.people.contains([person]))
 
     if conditions:
         query = query.where(and_(*conditions))
@@ -57,38 +71,36 @@ async def get_timeline(
     result = await db.execute(query)
     rows = result.all()
 
-    events = []
-    for event, doc_filename in rows:
-        events.append(TimelineEventResponse(
-            id=event.id,
-            document_id=event.document_id,
-            event_date=event.event_date,
-            event_type=event.event_type or "other",
-            title=event.title,
-            description=event.description,
-            companies=json.loads(event.companies) if event.companies else [],
-            people=json.loads(event.people) if event.people else [],
-            document_filename=doc_filename,
-        ))
-
-    # Get total count
-    count_query = select(func.count(TimelineEvent.id))
-    if conditions:
-        count_query = count_query.where(and_(*conditions))
-    count_result = await db.execute(count_query)
-    total_count = count_result.scalar() or 0
-
-    # Get date range
-    date_range_query = select(
-        func.min(TimelineEvent.event_date),
-        func.max(TimelineEvent.event_date)
-    )
-    date_result = await db.execute(date_range_query)
-    min_date, max_date = date_result.one()
+    events = _EVENTS_ADAPTER.validate_python([
+        {
+            "id": event.id,
+            "document_id": event.document_id,
+            "event_date": event.event_date,
+            "event_type": event.event_type or "other",
+            "title": event.title,
+            "description": event.description,
+            "companies": event.companies or [],
+            "people": event.people or [],
+            "document_filename": doc_filename,
+        }
+        for event, doc_filename, *_ in rows
+    ])
+
+    if rows:
+        total_count, min_date, max_date = rows[0][2:]
+    else:
+        # Empty page (no matches or offset past the end): fetch the totals alone
+        count_query = select(func.count(TimelineEvent.id))
+        if conditions:
+            count_query = count_query.where(and_(*conditions))
+        summary_result = await db.execute(
+            select(count_query.scalar_subquery(), min_date_expr, max_date_expr)
+        )
+        total_count, min_date, max_date = summary_result.one()
 
     return TimelineResponse(
         events=events,
-        total_count=total_count,
+        total_count=total_count or 0,
         date_range_start=min_date,
         date_range_end=max_date,
     )
@@ -97,21 +109,12 @@ async def get_timeline(
 @router.get("/timeline/companies", response_model=CompaniesListResponse)
 async def get_companies(db: AsyncSession = Depends(get_db)):
     """Get list of all companies mentioned in documents."""
-    # Get companies from DocumentMetadata
+    # Get distinct companies from DocumentMetadata, de-duplicated in SQL
     result = await db.execute(
-        select(DocumentMetadata.companies).where(DocumentMetadata.companies.isnot(None))
+        select(func.unnest(DocumentMetadata.companies)).distinct()
     )
 
-    all_companies = set()
-    for (companies_json,) in result:
-        if companies_json:
-            try:
-                companies = json.loads(companies_json)
-                all_companies.update(companies)
-            except json.JSONDecodeError:
-                pass
-
-    return CompaniesListResponse(companies=sorted(list(all_companies)))
+    return CompaniesListResponse(companies=sorted(row[0] for row in result))
 
 
 @router.get("/timeline/event-types")
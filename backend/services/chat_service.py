@@ -6,6 +6,7 @@ from typing import Optional
 
 from backend.services.knowledge_base import get_knowledge_base_service
 from backend.services.llm_service import get_llm_service
+from backend.services.semantic_cache import get_semantic_cache
 
 
 class ChatService:
@@ -18,34 +19,45 @@ class ChatService:
 
     RECENCY_KEYWORDS = ["recent", "latest", "last", "newest", "current", "today", "this week", "this month"]
 
+    # Patterns are compiled once here instead of on every chat turn
+    _RECENCY_RE = re.compile("|".join(re.escape(keyword) for keyword in RECENCY_KEYWORDS))
+    _MONTH_RE = re.compile(r"\b(" + "|".join(MONTHS) + r")\b")
+    _MONTH_INDEX = {month: i for i, month in enumerate(MONTHS)}
+    _YEAR_RE = re.compile(r'\b(20\d{2})\b')
+    _QUARTER_RE = re.compile(r'Q([1-4])\s*(20\d{2})?', re.IGNORECASE)
+
+    # Look for "about X", "at X", "with X", "for X" patterns in a single scan
+    _COMPANY_RE = re.compile(r'\b(?:about|at|with|for)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)')
+
     def __init__(self):
         self.kb = get_knowledge_base_service()
         self.llm = get_llm_service()
+        self.cache = get_semantic_cache()
 
     def _detect_time_hints(self, message: str) -> dict:
         """Detect time-related hints in the user's query."""
         hints = {}
         message_lower = message.lower()
 
-        # Check for recency keywords
-        if any(keyword in message_lower for keyword in self.RECENCY_KEYWORDS):
+        # Check for recency keywords (single scan for all keywords)
+        if self._RECENCY_RE.search(message_lower):
             hints["prioritize_recent"] = True
 
         # Check for month references
-        for i, month in enumerate(self.MONTHS):
-            if month in message_lower:
-                # Assume current year if not specified
-                year = datetime.now().year
-                hints["date_start"] = datetime(year, i + 1, 1)
-                # Set end date to start of next month
-                if i + 1 == 12:
-                    hints["date_end"] = datetime(year + 1, 1, 1)
-                else:
-                    hints["date_end"] = datetime(year, i + 2, 1)
-                break
+        month_match = self._MONTH_RE.search(message_lower)
+        if month_match:
+            i = self._MONTH_INDEX[month_match.group(1)]
+            # Assume current year if not specified
+            year = datetime.now().year
+            hints["date_start"] = datetime(year, i + 1, 1)
+            # Set end date to start of next month
+            if i + 1 == 12:
+                hints["date_end"] = datetime(year + 1, 1, 1)
+            else:
+                hints["date_end"] = datetime(year, i + 2, 1)
 
         # Check for year references (e.g., "in 2025", "2026")
-        year_match = re.search(r'\b(20\d{2})\b', message)
+        year_match = self._YEAR_RE.search(message)
         if year_match:
             year = int(year_match.group(1))
             if "date_start" not in hints:
@@ -53,7 +65,7 @@ class ChatService:
                 hints["date_end"] = datetime(year + 1, 1, 1)
 
         # Check for quarter references (e.g., "Q4 2025", "Q1")
-        quarter_match = re.search(r'Q([1-4])\s*(20\d{2})?', message, re.IGNORECASE)
+        quarter_match = self._QUARTER_RE.search(message)
         if quarter_match:
             quarter = int(quarter_match.group(1))
             year = int(quarter_match.group(2)) if quarter_match.group(2) else datetime.now().year
@@ -71,21 +83,43 @@ class ChatService:
         """Extract potential company names from the query."""
         # Simple pattern matching for common company name patterns
         # This could be enhanced with NER in the future
-        companies = []
-
-        # Look for "about X", "at X", "with X", "for X" patterns
-        patterns = [
-            r'\babout\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
-            r'\bat\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
-            r'\bwith\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
-            r'\bfor\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
-        ]
-
-        for pattern in patterns:
-            matches = re.findall(pattern, message)
-            companies.extend(matches)
-
-        return list(set(companies))
+        return list(set(self._COMPANY_RE.findall(message)))
+
+    def _build_search_params(self, message: str) -> dict:
+        """Build knowledge base search parameters from hints in the query."""
+        # Detect time hints in the query
+        time_hints = self._detect_time_hints(message)
+        company_hints = self._extract_company_hints(message)
+
+        # Build search parameters
+        search_params = {"query": message}
+
+        if time_hints.get("date_start"):
+            search_params["date_start"] = time_hints["date_start"]
+        if time_hints.get("date_end"):
+            search_params["date_end"] = time_hints["date_end"]
+        if time_hints.get("prioritize_recent"):
+            search_params["prioritize_recent"] = True
+        if company_hints:
+            search_params["companies"] = company_hints
+
+        return search_params
+
+    @staticmethod
+    def _cache_context(
+        use_knowledge_base: bool, history: Optional[list[dict]], search_params: Optional[dict]
+    ) -> tuple:
+        """Key the parts of a turn besides the query text that shape the answer."""
+        last_turn = hash((history[-1]["role"], history[-1]["content"])) if history else None
+        filters = None
+        if search_params:
+            # Paraphrases like "Q1 2025" vs "Q2 2025" embed closely but filter differently
+            filters = tuple(sorted(
+                (key, tuple(sorted(value)) if isinstance(value, list) else value)
+                for key, value in search_params.items()
+                if key != "query"
+            ))
+        return (use_knowledge_base, last_turn, filters)
 
     async def chat(
         self,
@@ -97,25 +131,26 @@ class ChatService:
         sources = []
         context = None
 
-        # Search knowledge base if enabled
-        if use_knowledge_base:
-            # Detect time hints in the query
-            time_hints = self._detect_time_hints(message)
-            company_hints = self._extract_company_hints(message)
+        search_params = self._build_search_params(message) if use_knowledge_base else None
 
-            # Build search parameters
-            search_params = {"query": message}
+        # Serve repeated or paraphrased questions from the response cache. The
+        # cache context keeps identical text in different settings apart.
+        cache_context = self._cache_context(use_knowledge_base, history, search_params)
+        cached = self.cache.get_exact(message, cache_context)
+        if cached is not None:
+            return cached
 
-            if time_hints.get("date_start"):
-                search_params["date_start"] = time_hints["date_start"]
-            if time_hints.get("date_end"):
-                search_params["date_end"] = time_hints["date_end"]
-            if time_hints.get("prioritize_recent"):
-                search_params["prioritize_recent"] = True
-            if company_hints:
-                search_params["companies"] = company_hints
+        # Search knowledge base if enabled. The query embedding serves both the
+        # search and the similarity tier of the cache; turns without the
+        # knowledge base use only the exact tier rather than run the encoder.
+        query_embedding = None
+        if use_knowledge_base:
+            query_embedding = await self.kb.embed_query(message)
+            cached = self.cache.get_similar(query_embedding, cache_context)
+            if cached is not None:
+                return cached
 
-            results = await self.kb.search(**search_params)
+            results = await self.kb.search(**search_params, query_embedding=query_embedding)
 
             if results:
                 # Build context from search results with date info
@@ -144,10 +179,12 @@ class ChatService:
             history=history,
         )
 
-        return {
+        payload = {
             "message": response,
             "sources": sources,
         }
+        self.cache.add(message, cache_context, payload, embedding=query_embedding)
+        return payload
 
 
 # Singleton
@@ -1,14 +1,23 @@
 """Document intelligence service for LLM-powered metadata extraction."""
 
-from datetime import datetime
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timezone
+from pathlib import Path
 from typing import Optional
 from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import HumanMessage, SystemMessage
+from pydantic import ValidationError
 
 from backend.config import get_settings
 from backend.models.schemas import DocumentExtraction, DocumentType, ExtractedEvent
+from backend.services.llm_service import get_llm_service
 
 
+# Bump whenever the extraction prompts change so cached results are not reused
+PROMPT_VERSION = "v1"
+
 EXTRACTION_SYSTEM_PROMPT = """You are a document analysis assistant. Your task is to extract structured metadata from documents.
 
 Analyze the document carefully and extract:
@@ -54,36 +63,88 @@ EXTRACTION_USER_PROMPT = """Analyze this document and extract structured metadat
 Extract the metadata following the schema provided. Be thorough with timeline events - capture all dated events mentioned."""
 
 
+class ExtractionCache:
+    """On-disk cache of extraction results keyed by content hash."""
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """Build a cache key from the model, prompt version and document text."""
+        prefix = f"{model}|{PROMPT_VERSION}|".encode()
+        return hashlib.sha256(prefix + text.encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[DocumentExtraction]:
+        """Return the cached extraction, or None on a miss or stale entry."""
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            return DocumentExtraction.model_validate(entry["extraction"])
+        except OSError:
+            return None
+        except (ValidationError, ValueError, KeyError, TypeError):
+            # Schema changed or the file is corrupt - evict it
+            path.unlink(missing_ok=True)
+            return None
+
+    def set(self, key: str, extraction: DocumentExtraction) -> None:
+        """Store an extraction result."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "cached_at": datetime.now(timezone.utc).isoformat(),
+            "extraction": extraction.model_dump(mode="json"),
+        }
+        # Write then rename so readers never see a partial file
+        path = self._path(key)
+        temp_path = path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(entry), encoding="utf-8")
+        temp_path.replace(path)
+
+
 class DocumentIntelligenceService:
     """Service for LLM-powered document analysis and metadata extraction."""
 
     def __init__(self):
         self.settings = get_settings()
         self._llm: Optional[ChatAnthropic] = None
+        self._structured_llm = None
+        self.cache = ExtractionCache(Path(self.settings.upload_dir) / ".extraction_cache")
 
     @property
     def llm(self) -> ChatAnthropic:
-        """Get or create the LLM instance with structured output."""
+        """Get the LLM instance, shared with the chat service."""
         if self._llm is None:
-            self._llm = ChatAnthropic(
-                model=self.settings.claude_model,
-                anthropic_api_key=self.settings.anthropic_api_key,
-                max_tokens=4096,
-            )
+            # One client means one HTTP connection pool for all Claude calls
+            self._llm = get_llm_service().llm
         return self._llm
 
+    @property
+    def structured_llm(self):
+        """Get or create the LLM bound to the DocumentExtraction schema."""
+        if self._structured_llm is None:
+            self._structured_llm = self.llm.with_structured_output(DocumentExtraction)
+        return self._structured_llm
+
     async def extract_document_metadata(self, text: str) -> DocumentExtraction:
         """Extract structured metadata from document text using Claude."""
         # Truncate very long documents to fit context
         max_chars = 15000
-        truncated_text = text[:max_chars]
         if len(text) > max_chars:
-            truncated_text += "\n\n[Document truncated for processing...]"
+            truncated_text = text[:max_chars] + "\n\n[Document truncated for processing...]"
+        else:
+            truncated_text = text
 
-        current_date = datetime.now().strftime("%Y-%m-%d")
+        # Identical documents (re-uploads, retries) skip the LLM call
+        cache_key = ExtractionCache.make_key(self.settings.claude_model, truncated_text)
+        cached = await asyncio.to_thread(self.cache.get, cache_key)
+        if cached is not None:
+            return cached
 
-        # Use structured output with LangChain
-        structured_llm = self.llm.with_structured_output(DocumentExtraction)
+        current_date = datetime.now().strftime("%Y-%m-%d")
 
         messages = [
             SystemMessage(content=EXTRACTION_SYSTEM_PROMPT.format(current_date=current_date)),
@@ -91,12 +152,17 @@ class DocumentIntelligenceService:
         ]
 
         try:
-            result = await structured_llm.ainvoke(messages)
-            return result
+            result = await self.structured_llm.ainvoke(messages)
         except Exception as e:
             # Fallback to basic extraction on error
             return self._fallback_extraction(text, str(e))
 
+        try:
+            await asyncio.to_thread(self.cache.set, cache_key, result)
+        except OSError:
+            pass  # Caching is best-effort
+        return result
+
     def _fallback_extraction(self, text: str, error: str) -> DocumentExtraction:
         """Provide basic extraction when LLM fails."""
         # Extract a simple title from first line
@@ -134,6 +200,12 @@ class DocumentIntelligenceService:
         """
         results = []
 
+        # Email threads and meeting notes carry several dated events; match
+        # each chunk against event titles (lowercased once, not per chunk)
+        event_titles = []
+        if doc_extraction.document_type in (DocumentType.EMAIL_THREAD, DocumentType.MEETING_NOTES):
+            event_titles = [(event.title.lower(), event.date) for event in doc_extraction.events]
+
         for i, chunk in enumerate(chunks):
             chunk_info = {
                 "chunk_index": i,
@@ -141,20 +213,12 @@ class DocumentIntelligenceService:
                 "is_timeless": doc_extraction.is_timeless,
             }
 
-            # For email threads, try to find specific dates in the chunk
-            if doc_extraction.document_type == DocumentType.EMAIL_THREAD:
-                # Check if any event date matches content in this chunk
-                for event in doc_extraction.events:
-                    # Simple heuristic: if event title/description appears in chunk
-                    if event.title.lower() in chunk.lower():
-                        chunk_info["chunk_date"] = event.date
-                        break
-
-            # For meeting notes with multiple dates
-            elif doc_extraction.document_type == DocumentType.MEETING_NOTES:
-                for event in doc_extraction.events:
-                    if event.title.lower() in chunk.lower():
-                        chunk_info["chunk_date"] = event.date
+            if event_titles:
+                # Simple heuristic: if event title appears in chunk
+                chunk_lower = chunk.lower()
+                for title, date in event_titles:
+                    if title in chunk_lower:
+                        chunk_info["chunk_date"] = date
                         break
 
             results.append(chunk_info)
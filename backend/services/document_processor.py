@@ -1,15 +1,68 @@
 """Document processing service for parsing various file formats."""
 
+import asyncio
+import io
+import multiprocessing
 import os
+import shutil
+import threading
+import time
 import uuid
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Callable, Iterator, Optional
 
 import pypdfium2 as pdfium
 from docx import Document as DocxDocument
 
 from backend.config import get_settings
-from backend.utils.text_processing import clean_text, generate_preview
+from backend.utils.text_processing import clean_text, clean_text_bytes, generate_preview
+
+# Block size used when copying uploads to disk
+COPY_BUFFER_SIZE = 64 * 1024
+
+# Uploads at least this large are parsed in a worker process rather than a thread
+PROCESS_POOL_MIN_SIZE = 1024 * 1024
+
+# Serializes PDFium calls made from worker threads
+_PDFIUM_LOCK = threading.Lock()
+
+
+def _extract_pdf(path: str) -> str:
+    """Extract text from a PDF file using pypdfium2."""
+    # PDFium is not thread-safe, so only one thread may use it at a time
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(path)
+        try:
+            text_parts = [""] * len(pdf)
+            for i in range(len(pdf)):
+                page = pdf[i]
+                textpage = page.get_textpage()
+                text_parts[i] = textpage.get_text_bounded()
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
+
+    return "\n\n".join(text_parts)
+
+
+def _extract_docx(path: str) -> str:
+    """Extract text from a DOCX file."""
+    doc = DocxDocument(path)
+
+    text_parts = [text for para in doc.paragraphs if (text := para.text).strip()]
+
+    # Also extract text from tables
+    for table in doc.tables:
+        for row in table.rows:
+            cell_texts = [text for cell in row.cells if (text := cell.text.strip())]
+            if cell_texts:
+                text_parts.append(" | ".join(cell_texts))
+
+    return "\n\n".join(text_parts)
 
 
 class DocumentProcessor:
@@ -26,6 +79,9 @@ class DocumentProcessor:
     def __init__(self):
         self.settings = get_settings()
         self._temp_files: dict[str, dict] = {}
+        # Uploads currently being saved; expiry leaves them alone
+        self._saving: set[str] = set()
+        self._process_pool: Optional[ProcessPoolExecutor] = None
 
     def is_supported(self, filename: str) -> bool:
         """Check if the file type is supported."""
@@ -40,98 +96,171 @@ class DocumentProcessor:
     async def process_upload(
         self, file_content: bytes, filename: str
     ) -> dict:
-        """Process an uploaded file and return extraction results."""
-        ext = Path(filename).suffix.lower()
+        """Process an uploaded file held in memory and return extraction results."""
+        return await self.process_upload_stream(io.BytesIO(file_content), filename)
 
-        # Extract text based on file type
-        if ext == ".pdf":
-            text = self._extract_pdf(file_content)
-        elif ext in (".docx", ".doc"):
-            text = await self._extract_docx(file_content, filename)
-        elif ext in (".txt", ".md"):
-            text = file_content.decode("utf-8", errors="ignore")
-        else:
+    async def process_upload_stream(self, fileobj: BinaryIO, filename: str) -> dict:
+        """Process an uploaded file object without buffering it in memory."""
+        ext = Path(filename).suffix.lower()
+        if ext not in self.SUPPORTED_TYPES:
             raise ValueError(f"Unsupported file type: {ext}")
 
-        # Clean the extracted text
-        text = clean_text(text)
-
         # Generate a unique upload ID
         upload_id = str(uuid.uuid4())
 
+        # Copy to a pending file; save_document later moves it into storage
+        pending_path = self._pending_dir / f"{upload_id}{ext}"
+        file_size = await asyncio.to_thread(self._write_pending, fileobj, pending_path)
+
+        # Extract and clean text based on file type
+        try:
+            if ext == ".pdf":
+                text = clean_text(await self._run_extractor(_extract_pdf, pending_path, file_size))
+            elif ext in (".docx", ".doc"):
+                text = clean_text(await self._run_extractor(_extract_docx, pending_path, file_size))
+            else:
+                # Plain text is cleaned at the byte level before it is decoded
+                text = clean_text_bytes(await asyncio.to_thread(pending_path.read_bytes))
+        except Exception:
+            pending_path.unlink(missing_ok=True)
+            raise
+
+        preview = generate_preview(text)
+
+        # Keep only the preview in memory; the full text waits on disk until
+        # the upload is saved or expires
+        text_path = self._pending_dir / f"{upload_id}.txt"
+        await asyncio.to_thread(text_path.write_text, text, encoding="utf-8")
+
         # Store temporarily
+        self._purge_expired()
         self._temp_files[upload_id] = {
             "filename": filename,
             "file_type": self.get_file_type(filename),
-            "file_size": len(file_content),
-            "full_text": text,
-            "preview": generate_preview(text),
-            "content": file_content,
+            "file_size": file_size,
+            "preview": preview,
+            "content_path": str(pending_path),
+            "text_path": str(text_path),
+            "created_at": time.monotonic(),
         }
 
         return {
             "upload_id": upload_id,
             "filename": filename,
             "file_type": self.get_file_type(filename),
-            "file_size": len(file_content),
-            "preview": generate_preview(text),
+            "file_size": file_size,
+            "preview": preview,
             "full_text_length": len(text),
         }
 
-    def _extract_pdf(self, content: bytes) -> str:
-        """Extract text from a PDF file using pypdfium2."""
-        text_parts = []
+    @property
+    def _pending_dir(self) -> Path:
+        """Directory holding uploads that have not been saved yet."""
+        return Path(self.settings.upload_dir) / ".pending"
 
-        pdf = pdfium.PdfDocument(content)
-        for page in pdf:
-            textpage = page.get_textpage()
-            text_parts.append(textpage.get_text_bounded())
-            textpage.close()
-            page.close()
-        pdf.close()
+    @property
+    def process_pool(self) -> ProcessPoolExecutor:
+        """Get or create the process pool used for large extractions."""
+        if self._process_pool is None:
+            # spawn: forking a process that already runs threads is unsafe
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=min(4, os.cpu_count() or 1),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._process_pool
 
-        return "\n\n".join(text_parts)
+    async def _run_extractor(self, extractor: Callable[[str], str], path: Path, file_size: int) -> str:
+        """Run a text extractor off the event loop."""
+        # Large files parse in parallel across processes; small ones are not
+        # worth the inter-process overhead and use a thread
+        if file_size >= PROCESS_POOL_MIN_SIZE:
+            loop = asyncio.get_running_loop()
+            pool = self.process_pool
+            try:
+                return await loop.run_in_executor(pool, extractor, str(path))
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM or a crash in PDFium), which breaks the
+                # whole pool; replace it so later uploads are not affected, and
+                # retry this file in a thread. Concurrent failures only reset once.
+                if self._process_pool is pool:
+                    self._reset_process_pool()
+        return await asyncio.to_thread(extractor, str(path))
 
-    async def _extract_docx(self, content: bytes, filename: str) -> str:
-        """Extract text from a DOCX file."""
-        # Save temporarily to read with python-docx
-        temp_path = Path(self.settings.upload_dir) / f"temp_{uuid.uuid4()}.docx"
+    def _reset_process_pool(self):
+        """Discard a broken process pool so the next extraction starts a new one."""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
 
-        try:
-            temp_path.write_bytes(content)
-            doc = DocxDocument(str(temp_path))
-
-            text_parts = []
-            for para in doc.paragraphs:
-                if para.text.strip():
-                    text_parts.append(para.text)
-
-            # Also extract text from tables
-            for table in doc.tables:
-                for row in table.rows:
-                    row_text = " | ".join(cell.text.strip() for cell in row.cells if cell.text.strip())
-                    if row_text:
-                        text_parts.append(row_text)
-
-            return "\n\n".join(text_parts)
-        finally:
-            if temp_path.exists():
-                temp_path.unlink()
+    @staticmethod
+    def _write_pending(fileobj: BinaryIO, path: Path) -> int:
+        """Copy an upload to disk in fixed-size blocks and return its size."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as out:
+            shutil.copyfileobj(fileobj, out, COPY_BUFFER_SIZE)
+            return out.tell()
 
     def get_temp_file(self, upload_id: str) -> Optional[dict]:
         """Retrieve a temporarily stored file by upload ID."""
+        self._purge_expired()
         return self._temp_files.get(upload_id)
 
+    @contextmanager
+    def saving_temp_file(self, upload_id: str) -> Iterator[Optional[dict]]:
+        """Retrieve a temporarily stored file and keep it from expiring until the block exits."""
+        self._saving.add(upload_id)
+        try:
+            yield self.get_temp_file(upload_id)
+        finally:
+            self._saving.discard(upload_id)
+
+    async def read_temp_text(self, temp_file: dict) -> str:
+        """Load the extracted text of a temporarily stored file."""
+        return await asyncio.to_thread(Path(temp_file["text_path"]).read_text, encoding="utf-8")
+
     def remove_temp_file(self, upload_id: str) -> bool:
         """Remove a temporarily stored file."""
-        if upload_id in self._temp_files:
-            del self._temp_files[upload_id]
-            return True
-        return False
+        temp_file = self._temp_files.pop(upload_id, None)
+        if temp_file is None:
+            return False
+        Path(temp_file["content_path"]).unlink(missing_ok=True)
+        Path(temp_file["text_path"]).unlink(missing_ok=True)
+        return True
+
+    def _purge_expired(self):
+        """Drop uploads that were never saved within the TTL."""
+        cutoff = time.monotonic() - self.settings.upload_ttl_seconds
+        for upload_id, temp_file in list(self._temp_files.items()):
+            if temp_file["created_at"] < cutoff and upload_id not in self._saving:
+                self.remove_temp_file(upload_id)
+
+    def sweep_pending_dir(self):
+        """Delete pending files older than the TTL, including ones orphaned by a restart."""
+        # _temp_files only tracks this process's uploads; anything else left in
+        # the pending directory is unreachable once it has outlived the TTL
+        cutoff = time.time() - self.settings.upload_ttl_seconds
+        tracked = {
+            Path(temp_file[key]) for temp_file in self._temp_files.values() for key in ("content_path", "text_path")
+        }
+        if not self._pending_dir.is_dir():
+            return
+        for path in self._pending_dir.iterdir():
+            if path in tracked:
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                continue
 
     def clear_temp_files(self):
         """Clear all temporary files."""
-        self._temp_files.clear()
+        for upload_id in list(self._temp_files):
+            self.remove_temp_file(upload_id)
+
+    def shutdown(self):
+        """Stop the extraction process pool, if it was started."""
+        self._reset_process_pool()
 
 
 # Singleton instance
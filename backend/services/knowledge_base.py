@@ -1,33 +1,168 @@
 """Knowledge base service for vector storage and retrieval using pgvector."""
 
+import asyncio
+import csv
+import hashlib
+import io
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Optional
+from operator import itemgetter
+from typing import AsyncIterator, Optional
 
+import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
-from sqlalchemy import select, delete, func, and_
+from sqlalchemy import select, delete, func, and_, insert, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.config import get_settings
+from backend.utils.dates import parse_iso_date
 from backend.utils.text_processing import chunk_text
 from backend.models.schemas import DocumentExtraction
-from backend.models.database import DocumentChunk, async_session_maker
+from backend.models.database import DocumentChunk, get_sessionmaker
+
+
+# Recently embedded search queries kept in memory
+QUERY_CACHE_MAX_ENTRIES = 1024
+QUERY_CACHE_TTL_SECONDS = 600
+
+# Queries at least this long are first tried as a verbatim substring of chunk text
+EXACT_MATCH_MIN_CHARS = 20
+
+# Documents with at least this many chunks are written with COPY instead of INSERT
+COPY_MIN_CHUNKS = 256
+
+
+def _escape_like(value: str) -> str:
+    """Escape LIKE wildcards so the value matches literally."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _copy_value(column: str, value):
+    """Render a chunk column value in PostgreSQL's text input format."""
+    if value is None:
+        return None  # Unquoted empty field, read by COPY as NULL
+    if column == "embedding":
+        return "[" + ",".join(map(str, value)) + "]"
+    if column in ("companies", "people"):
+        items = (item.replace("\\", "\\\\").replace('"', '\\"') for item in value)
+        return "{" + ",".join(f'"{item}"' for item in items) + "}"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _chunk_rows_to_csv(rows: list[dict], defaults: dict) -> io.BytesIO:
+    """Serialize chunk rows as CSV for COPY, appending column defaults."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        row = {**row, **defaults}
+        writer.writerow([_copy_value(column, value) for column, value in row.items()])
+    return io.BytesIO(buffer.getvalue().encode())
+
+
+class EmbeddingCache:
+    """In-memory LRU cache of chunk embeddings keyed by a hash of the text."""
+
+    def __init__(self, model: str, max_entries: int = 20000):
+        # BLAKE2b keys are limited to 64 bytes; model paths can be longer
+        self._hash_key = hashlib.blake2b(model.encode(), digest_size=32).digest()
+        self.max_entries = max_entries
+        self._entries: OrderedDict[bytes, np.ndarray] = OrderedDict()
+
+    def key(self, text: str) -> bytes:
+        """Hash text together with the model name so models never share entries."""
+        return hashlib.blake2b(text.encode(), digest_size=16, key=self._hash_key).digest()
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        """Return the cached embedding as float32, or None on a miss."""
+        embedding = self._entries.get(key)
+        if embedding is None:
+            return None
+        self._entries.move_to_end(key)
+        return embedding.astype(np.float32)
+
+    def set(self, key: bytes, embedding: np.ndarray) -> None:
+        """Store an embedding, evicting the least recently used entry when full."""
+        # float16 halves memory and matches the HALFVEC precision stored in the database
+        self._entries[key] = embedding.astype(np.float16)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
 
 
 class LocalEmbeddings:
     """Wrapper for local sentence-transformers embeddings."""
 
-    def __init__(self, model: str = "all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model)
-
-    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+    def __init__(
+        self,
+        model: str = "all-MiniLM-L6-v2",
+        batch_size: int = 64,
+        cache_size: int = 20000,
+        backend: str = "torch",
+        model_file: str = "",
+        num_threads: int = 0,
+        device: str = "",
+    ):
+        # Containers often get a CPU quota the default thread count ignores
+        if num_threads > 0:
+            torch.set_num_threads(num_threads)
+
+        # backend="onnx" runs the same model on ONNX Runtime; model_file picks a
+        # pre-exported variant such as a dynamically quantized INT8 graph
+        model_kwargs = {"file_name": model_file} if model_file else None
+        # An empty device lets sentence-transformers pick CUDA, then MPS, then CPU
+        self.model = SentenceTransformer(
+            model, device=device or None, backend=backend, model_kwargs=model_kwargs
+        )
+        if backend == "torch" and self.model.device.type == "cuda":
+            # fp16 runs on tensor cores; stored vectors are half precision anyway
+            self.model.half()
+        self.batch_size = batch_size
+        self.cache = EmbeddingCache(model, max_entries=cache_size)
+
+    async def aembed_documents(self, texts: list[str]) -> np.ndarray:
         """Embed a list of documents."""
-        embeddings = self.model.encode(texts, convert_to_numpy=True)
-        return embeddings.tolist()
+        if not texts:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        # Re-indexed documents and repeated boilerplate skip the encoder;
+        # duplicate texts within the batch are encoded once
+        keys = [self.cache.key(text) for text in texts]
+        embeddings = [self.cache.get(key) for key in keys]
+        missing: dict[bytes, list[int]] = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                missing.setdefault(keys[i], []).append(i)
+
+        if missing:
+            # Encoding is CPU-bound; keep it off the event loop. encode() sorts the
+            # texts by length before batching, so each mini-batch pads minimally.
+            encoded = await asyncio.to_thread(
+                self.model.encode,
+                [texts[indices[0]] for indices in missing.values()],
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            )
+            for (key, indices), embedding in zip(missing.items(), encoded):
+                self.cache.set(key, embedding)
+                for i in indices:
+                    embeddings[i] = embedding
 
-    async def aembed_query(self, text: str) -> list[float]:
+        # Rows stay float32 arrays; the pgvector type serializes them directly
+        return np.stack(embeddings)
+
+    async def aembed_query(self, text: str) -> np.ndarray:
         """Embed a single query."""
-        embedding = self.model.encode(text, convert_to_numpy=True)
-        return embedding.tolist()
+        embedding = await asyncio.to_thread(
+            self.model.encode, text, convert_to_numpy=True, normalize_embeddings=True
+        )
+        return embedding
 
 
 class KnowledgeBaseService:
@@ -36,6 +171,8 @@ class KnowledgeBaseService:
     def __init__(self):
         self.settings = get_settings()
         self._embeddings: Optional[LocalEmbeddings] = None
+        # query -> (embedding, stored_at); repeated queries skip the encoder
+        self._query_cache: OrderedDict[str, tuple[np.ndarray, float]] = OrderedDict()
 
     @property
     def embeddings(self) -> LocalEmbeddings:
@@ -43,9 +180,46 @@ class KnowledgeBaseService:
         if self._embeddings is None:
             self._embeddings = LocalEmbeddings(
                 model=self.settings.embedding_model,
+                batch_size=self.settings.embedding_batch_size,
+                cache_size=self.settings.embedding_cache_size,
+                backend=self.settings.embedding_backend,
+                model_file=self.settings.embedding_model_file,
+                num_threads=self.settings.embedding_num_threads,
+                device=self.settings.embedding_device,
             )
         return self._embeddings
 
+    @asynccontextmanager
+    async def _session(self, db: Optional[AsyncSession]) -> AsyncIterator[AsyncSession]:
+        """Use the caller's session, or open one that commits when the block succeeds."""
+        if db is not None:
+            yield db
+            return
+        async with get_sessionmaker().begin() as session:
+            yield session
+
+    async def embed_query(self, query: str) -> np.ndarray:
+        """Embed a search query, reusing recent results for repeated queries."""
+        cached = self._query_cache.get(query)
+        if cached is not None and time.monotonic() - cached[1] < QUERY_CACHE_TTL_SECONDS:
+            self._query_cache.move_to_end(query)
+            return cached[0]
+
+        embedding = await self.embeddings.aembed_query(query)
+        self._query_cache[query] = (embedding, time.monotonic())
+        self._query_cache.move_to_end(query)
+        while len(self._query_cache) > QUERY_CACHE_MAX_ENTRIES:
+            self._query_cache.popitem(last=False)
+        return embedding
+
+    async def embed_document(self, text: str, pre_cleaned: bool = False) -> tuple[list[str], np.ndarray]:
+        """Split a document into chunks and embed them."""
+        # Text from DocumentProcessor is cleaned at upload time and can pass pre_cleaned
+        chunks = chunk_text(text, pre_cleaned=pre_cleaned)
+        if not chunks:
+            return [], np.empty((0, self.settings.embedding_dimensions), dtype=np.float32)
+        return chunks, await self.embeddings.aembed_documents(chunks)
+
     async def index_document(
         self, document_id: int, filename: str, text: str, db: AsyncSession = None
     ) -> int:
@@ -57,32 +231,21 @@ class KnowledgeBaseService:
 
         chunk_embeddings = await self.embeddings.aembed_documents(chunks)
 
-        should_close = False
-        if db is None:
-            db = async_session_maker()
-            should_close = True
-
-        try:
-            # Build all chunk records first, then bulk insert
-            chunk_records = [
-                DocumentChunk(
-                    document_id=document_id,
-                    filename=filename,
-                    chunk_index=i,
-                    text=chunk,
-                    embedding=embedding,
-                )
+        async with self._session(db) as db:
+            # Plain row dicts through a Core insert: no ORM instances or unit of work
+            rows = [
+                {
+                    "document_id": document_id,
+                    "filename": filename,
+                    "chunk_index": i,
+                    "text": chunk,
+                    "embedding": embedding,
+                }
                 for i, (chunk, embedding) in enumerate(zip(chunks, chunk_embeddings))
             ]
-            db.add_all(chunk_records)
-            await db.flush()
-            if should_close:
-                await db.commit()
+            await self._insert_chunks(db, rows)
 
             return len(chunks)
-        finally:
-            if should_close:
-                await db.close()
 
     async def index_document_with_metadata(
         self,
@@ -91,61 +254,82 @@ class KnowledgeBaseService:
         text: str,
         extraction: DocumentExtraction,
         db: AsyncSession = None,
+        embedded: Optional[tuple[list[str], np.ndarray]] = None,
     ) -> int:
         """Index a document with time-aware metadata."""
         from backend.services.document_intelligence import get_document_intelligence_service
 
-        chunks = chunk_text(text)
+        # Callers may embed ahead of time (see embed_document) to overlap it with other work
+        if embedded is None:
+            embedded = await self.embed_document(text)
+        chunks, chunk_embeddings = embedded
 
         if not chunks:
             return 0
 
         intelligence = get_document_intelligence_service()
         chunk_dates = intelligence.assign_chunk_dates(chunks, extraction)
-        chunk_embeddings = await self.embeddings.aembed_documents(chunks)
-
-        should_close = False
-        if db is None:
-            db = async_session_maker()
-            should_close = True
 
-        try:
-            # Build all chunk records first, then bulk insert
-            chunk_records = []
+        async with self._session(db) as db:
+            # Plain row dicts through a Core insert: no ORM instances or unit of work
+            document_type = extraction.document_type.value
+            companies = extraction.companies or []
+            people = extraction.people or []
+            rows = []
             for i, (chunk, embedding) in enumerate(zip(chunks, chunk_embeddings)):
                 chunk_info = chunk_dates[i] if i < len(chunk_dates) else {}
-                chunk_date_str = chunk_info.get("chunk_date")
-                chunk_date = None
-                if chunk_date_str:
-                    try:
-                        chunk_date = datetime.fromisoformat(chunk_date_str)
-                    except (ValueError, TypeError):
-                        pass
-
-                is_timeless = chunk_info.get("is_timeless", extraction.is_timeless)
-
-                chunk_records.append(DocumentChunk(
-                    document_id=document_id,
-                    filename=filename,
-                    chunk_index=i,
-                    text=chunk,
-                    embedding=embedding,
-                    chunk_date=chunk_date,
-                    is_timeless=is_timeless,
-                    document_type=extraction.document_type.value,
-                    companies=extraction.companies or [],
-                    people=extraction.people or [],
-                ))
-
-            db.add_all(chunk_records)
-            await db.flush()
-            if should_close:
-                await db.commit()
+                rows.append({
+                    "document_id": document_id,
+                    "filename": filename,
+                    "chunk_index": i,
+                    "text": chunk,
+                    "embedding": embedding,
+                    "chunk_date": parse_iso_date(chunk_info.get("chunk_date")),
+                    "is_timeless": chunk_info.get("is_timeless", extraction.is_timeless),
+                    "document_type": document_type,
+                    "companies": companies,
+                    "people": people,
+                })
+
+            await self._insert_chunks(db, rows)
 
             return len(chunks)
-        finally:
-            if should_close:
-                await db.close()
+
+    @staticmethod
+    async def _set_local(db: AsyncSession, settings: dict[str, Optional[str]]) -> None:
+        """Apply settings for the rest of the current transaction in one round trip."""
+        await db.execute(
+            text(
+                "SELECT set_config(name, value, true) "
+                "FROM unnest(CAST(:names AS text[]), CAST(:values AS text[])) AS s(name, value)"
+            ),
+            {"names": list(settings), "values": list(settings.values())},
+        )
+
+    async def _insert_chunks(self, db: AsyncSession, rows: list[dict]) -> None:
+        """Insert chunk rows, switching to COPY for large documents."""
+        if len(rows) < COPY_MIN_CHUNKS:
+            await db.execute(insert(DocumentChunk), rows)
+            return
+
+        # COPY skips per-row parse/bind; it runs on the session's own connection
+        # so it stays inside the current transaction
+        columns = list(rows[0])
+        defaults = {
+            column.name: column.default.arg
+            for column in DocumentChunk.__table__.columns
+            if column.default is not None and column.default.is_scalar and column.name not in rows[0]
+        }
+        columns.extend(defaults)
+
+        connection = await db.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_to_table(
+            DocumentChunk.__tablename__,
+            source=_chunk_rows_to_csv(rows, defaults),
+            columns=columns,
+            format="csv",
+        )
 
     async def search(
         self,
@@ -157,64 +341,106 @@ class KnowledgeBaseService:
         prioritize_recent: bool = False,
         companies: list[str] = None,
         include_timeless: bool = True,
+        query_embedding: Optional[np.ndarray] = None,
         db: AsyncSession = None,
     ) -> list[dict]:
         """Search the knowledge base with optional time-aware filtering."""
         if top_k is None:
             top_k = self.settings.top_k_results
 
-        query_embedding = await self.embeddings.aembed_query(query)
-        fetch_limit = top_k * 2 if prioritize_recent else top_k
+        # Build filter conditions
+        conditions = []
+
+        if document_ids:
+            conditions.append(DocumentChunk.document_id.in_(document_ids))
+
+        if companies:
+            # Match any of the specified companies using array overlap
+            conditions.append(DocumentChunk.companies.overlap(companies))
+
+        # A pasted snippet that appears verbatim in enough chunks needs no
+        # embedding or ANN scan. Callers that already embedded the query gain
+        # nothing from it, and date and recency options re-rank or post-filter
+        # the vector results, so those always take the vector path.
+        if (
+            query_embedding is None
+            and len(query) >= EXACT_MATCH_MIN_CHARS
+            and not (date_start or date_end or prioritize_recent)
+        ):
+            async with self._session(db) as session:
+                result = await session.execute(
+                    select(DocumentChunk)
+                    .where(DocumentChunk.text.ilike(f"%{_escape_like(query)}%", escape="\\"), *conditions)
+                    # Chunks the snippet covers most of come first; the rest
+                    # keeps the order stable between identical searches
+                    .order_by(
+                        func.similarity(DocumentChunk.text, query).desc(),
+                        DocumentChunk.document_id.desc(),
+                        DocumentChunk.chunk_index,
+                    )
+                    .limit(top_k)
+                )
+                exact_matches = result.scalars().all()
+            if len(exact_matches) >= top_k:
+                return [self._format_result(chunk, 1.0) for chunk in exact_matches]
 
-        should_close = False
-        if db is None:
-            db = async_session_maker()
-            should_close = True
+        # Callers that already embedded the query can pass it in
+        if query_embedding is None:
+            query_embedding = await self.embed_query(query)
+        fetch_limit = top_k * 2 if prioritize_recent else top_k
 
-        try:
-            # pgvector cosine_distance: smaller = more similar
-            # Convert to similarity score: 1 - distance
-            distance_expr = DocumentChunk.embedding.cosine_distance(query_embedding)
+        owns_session = db is None
+        async with self._session(db) as db:
+            # Embeddings are unit length, so cosine similarity is the inner product.
+            # pgvector's <#> returns the negative inner product: smaller = more similar
+            distance_expr = DocumentChunk.embedding.max_inner_product(query_embedding)
 
             stmt = select(
                 DocumentChunk,
-                (1 - distance_expr).label('score')
+                (distance_expr * -1).label('score')
             )
 
-            # Build filter conditions
-            conditions = []
-
-            if document_ids:
-                conditions.append(DocumentChunk.document_id.in_(document_ids))
-
-            if companies:
-                # Match any of the specified companies using array overlap
-                conditions.append(DocumentChunk.companies.overlap(companies))
-
             if conditions:
                 stmt = stmt.where(and_(*conditions))
 
             # Order by distance (ascending = most similar first)
             stmt = stmt.order_by(distance_expr).limit(fetch_limit)
 
+            # An HNSW scan yields at most ef_search candidates (default 40)
+            hnsw_settings = {}
+            ef_search = fetch_limit * 4
+            if ef_search > 40:
+                hnsw_settings["hnsw.ef_search"] = str(ef_search)
+            if conditions:
+                # Filters apply to the scan's candidates, so a selective one could
+                # leave fewer than top_k rows; keep scanning until the limit is met
+                # (pgvector 0.8+). Relaxed order is re-sorted below.
+                hnsw_settings["hnsw.iterative_scan"] = "relaxed_order"
+
+            # SET LOCAL lasts until the caller's transaction ends, so a caller's
+            # session gets its previous values back after this query
+            previous_settings = None
+            if hnsw_settings and not owns_session:
+                # missing_ok: NULL until pgvector is loaded in this backend
+                result = await db.execute(
+                    text("SELECT name, current_setting(name, true) FROM unnest(CAST(:names AS text[])) AS name"),
+                    {"names": list(hnsw_settings)},
+                )
+                previous_settings = dict(result.tuples().all())
+            if hnsw_settings:
+                await self._set_local(db, hnsw_settings)
+
             result = await db.execute(stmt)
             rows = result.all()
 
+            if previous_settings is not None:
+                # A NULL value resets the setting to its default
+                await self._set_local(db, previous_settings)
+
             # Format results
             formatted_results = []
+            now = datetime.now()
             for chunk, score in rows:
-                result_dict = {
-                    "document_id": chunk.document_id,
-                    "filename": chunk.filename,
-                    "chunk_index": chunk.chunk_index,
-                    "text": chunk.text,
-                    "score": float(score),
-                    "chunk_date": chunk.chunk_date.isoformat() if chunk.chunk_date else None,
-                    "is_timeless": chunk.is_timeless,
-                    "document_type": chunk.document_type,
-                    "companies": chunk.companies or [],
-                }
-
                 # Apply date filtering in post-processing
                 chunk_date = chunk.chunk_date
                 if chunk_date:
@@ -222,81 +448,61 @@ class KnowledgeBaseService:
                         continue
                     if date_end and chunk_date > date_end:
                         continue
-                elif not include_timeless and not result_dict["is_timeless"]:
+                elif not include_timeless and not chunk.is_timeless:
                     if date_start or date_end:
                         continue
 
-                formatted_results.append(result_dict)
-
-            # Re-rank with recency boost if requested
-            if prioritize_recent:
-                formatted_results = self._rerank_with_recency(formatted_results)
-
-            return formatted_results[:top_k]
-        finally:
-            if should_close:
-                await db.close()
-
-    def _rerank_with_recency(self, results: list[dict]) -> list[dict]:
-        """Boost scores for more recent content."""
-        now = datetime.now()
+                score = float(score)
+                # Boost recent content while the date is still a datetime
+                if prioritize_recent and chunk_date and not chunk.is_timeless:
+                    score *= 1 + self._recency_boost((now - chunk_date).days)
 
-        for result in results:
-            if result.get("is_timeless"):
-                continue
+                formatted_results.append(self._format_result(chunk, score))
 
-            chunk_date_str = result.get("chunk_date")
-            if chunk_date_str:
-                try:
-                    date = datetime.fromisoformat(chunk_date_str)
-                    days_ago = (now - date).days
+            # Re-rank by boosted score if requested, or restore exact order
+            # after a relaxed iterative scan
+            if prioritize_recent or conditions:
+                formatted_results.sort(key=itemgetter("score"), reverse=True)
 
-                    if days_ago < 30:
-                        boost = 0.2 * (1 - days_ago / 30)
-                    elif days_ago > 365:
-                        boost = -0.1 * min(days_ago / 365, 1)
-                    else:
-                        boost = 0
-
-                    result["score"] = result["score"] * (1 + boost)
-                except (ValueError, TypeError):
-                    pass
+            return formatted_results[:top_k]
 
-        return sorted(results, key=lambda x: x["score"], reverse=True)
+    @staticmethod
+    def _format_result(chunk: DocumentChunk, score: float) -> dict:
+        """Build a search result dict from a chunk row."""
+        return {
+            "document_id": chunk.document_id,
+            "filename": chunk.filename,
+            "chunk_index": chunk.chunk_index,
+            "text": chunk.text,
+            "score": score,
+            "chunk_date": chunk.chunk_date.isoformat() if chunk.chunk_date else None,
+            "is_timeless": chunk.is_timeless,
+            "document_type": chunk.document_type,
+            "companies": chunk.companies or [],
+        }
+
+    @staticmethod
+    def _recency_boost(days_ago: int) -> float:
+        """Score multiplier offset favouring content from the last month."""
+        if days_ago < 30:
+            return 0.2 * (1 - days_ago / 30)
+        if days_ago > 365:
+            return -0.1 * min(days_ago / 365, 1)
+        return 0.0
 
     async def delete_document(self, document_id: int, db: AsyncSession = None) -> bool:
         """Delete all chunks for a document from the knowledge base."""
-        should_close = False
-        if db is None:
-            db = async_session_maker()
-            should_close = True
-
-        try:
+        async with self._session(db) as db:
             stmt = delete(DocumentChunk).where(DocumentChunk.document_id == document_id)
             await db.execute(stmt)
-
-            if should_close:
-                await db.commit()
-
             return True
-        finally:
-            if should_close:
-                await db.close()
 
     async def get_document_count(self, db: AsyncSession = None) -> int:
         """Get the total number of chunks in the knowledge base."""
-        should_close = False
-        if db is None:
-            db = async_session_maker()
-            should_close = True
-
-        try:
+        async with self._session(db) as db:
             stmt = select(func.count()).select_from(DocumentChunk)
             result = await db.execute(stmt)
             return result.scalar() or 0
-        finally:
-            if should_close:
-                await db.close()
 
 
 # Singleton instance
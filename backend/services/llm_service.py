@@ -21,7 +21,9 @@ class LLMService:
             self._llm = ChatAnthropic(
                 model=self.settings.claude_model,
                 anthropic_api_key=self.settings.anthropic_api_key,
-                max_tokens=4096,
+                max_tokens=self.settings.llm_max_tokens,
+                timeout=self.settings.llm_timeout_seconds,
+                max_retries=self.settings.llm_max_retries,
             )
         return self._llm
 
@@ -0,0 +1,98 @@
+"""In-memory cache of chat responses keyed by query text and embedding similarity."""
+
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+import numpy as np
+
+from backend.config import get_settings
+
+
+class SemanticCache:
+    """Two-tier response cache: exact normalized text, then cosine similarity."""
+
+    def __init__(self, dim: int, threshold: float = 0.97, ttl: float = 3600, max_entries: int = 512):
+        self.dim = dim
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # (context, normalized query) -> (unit embedding or None, payload, stored_at)
+        self._entries: OrderedDict[tuple, tuple[Optional[np.ndarray], dict, float]] = OrderedDict()
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Normalize query text for exact matching."""
+        return " ".join(query.lower().split())
+
+    def get_exact(self, query: str, context: Hashable) -> Optional[dict]:
+        """Return a cached payload for the same query in the same context."""
+        key = (context, self.normalize_query(query))
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[2] > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def get_similar(self, embedding, context: Hashable) -> Optional[dict]:
+        """Return the payload of the most similar cached query in the same context."""
+        self._evict_expired()
+        keys = [key for key, entry in self._entries.items() if key[0] == context and entry[0] is not None]
+        if not keys:
+            return None
+
+        matrix = np.stack([self._entries[key][0] for key in keys])
+        scores = matrix @ self._unit(embedding)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+
+        self._entries.move_to_end(keys[best])
+        return self._entries[keys[best]][1]
+
+    def add(self, query: str, context: Hashable, payload: dict, embedding=None) -> None:
+        """Store a response payload, evicting the least recently used entry when full."""
+        key = (context, self.normalize_query(query))
+        unit = self._unit(embedding) if embedding is not None else None
+        self._entries[key] = (unit, payload, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached response (e.g. after the knowledge base changes)."""
+        self._entries.clear()
+
+    def _evict_expired(self) -> None:
+        """Remove entries older than the TTL."""
+        cutoff = time.monotonic() - self.ttl
+        expired = [key for key, entry in self._entries.items() if entry[2] < cutoff]
+        for key in expired:
+            del self._entries[key]
+
+    def _unit(self, embedding) -> np.ndarray:
+        """Return the embedding as a unit-length float32 vector."""
+        vector = np.asarray(embedding, dtype=np.float32).reshape(self.dim)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+# Singleton
+_semantic_cache: Optional[SemanticCache] = None
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Get the chat response cache singleton."""
+    global _semantic_cache
+    if _semantic_cache is None:
+        settings = get_settings()
+        _semantic_cache = SemanticCache(
+            dim=settings.embedding_dimensions,
+            threshold=settings.chat_cache_similarity_threshold,
+            ttl=settings.chat_cache_ttl_seconds,
+            max_entries=settings.chat_cache_max_entries,
+        )
+    return _semantic_cache
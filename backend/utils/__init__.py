@@ -1,5 +1,6 @@
 """Utilities package."""
 
-from .text_processing import chunk_text, clean_text, generate_preview
+from .dates import parse_iso_date
+from .text_processing import chunk_text, chunk_texts, clean_text, clean_text_bytes, generate_preview, iter_chunks
 
-__all__ = ["chunk_text", "clean_text", "generate_preview"]
+__all__ = ["chunk_text", "chunk_texts", "clean_text", "clean_text_bytes", "generate_preview", "iter_chunks", "parse_iso_date"]
@@ -0,0 +1,17 @@
+"""Date parsing utilities."""
+
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+
+@lru_cache(maxsize=1024)
+def parse_iso_date(date_str: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO date string to datetime, returning None if missing or invalid."""
+    # Cached: a document's chunks and events repeat the same few dates
+    if not date_str:
+        return None
+    try:
+        return datetime.fromisoformat(date_str)
+    except (ValueError, TypeError):
+        return None
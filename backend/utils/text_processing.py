@@ -1,26 +1,49 @@
 """Text processing utilities for document handling and RAG."""
 
 import re
+from functools import lru_cache
+from typing import Iterator
+
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from backend.config import get_settings
 
+# Control characters removed by clean_text: the ones str.split() does not
+# already treat as whitespace (\x0b, \x0c and \x1c-\x1f are collapsed instead)
+_CTRL_RE = re.compile(r"[\x00-\x08\x0e-\x1b\x7f]")
+# Control bytes that are not whitespace; none of them can occur inside a
+# multi-byte UTF-8 sequence, so they are safe to delete before decoding
+_CTRL_BYTES = bytes([*range(0x09), *range(0x0E, 0x1C), 0x7F])
+# str.translate has a C fast path for ASCII strings that beats the regex there,
+# but is much slower than it on wider strings
+_CTRL_TABLE = dict.fromkeys(_CTRL_BYTES)
+
 
 def clean_text(text: str) -> str:
     """Clean and normalize text content."""
-    # Remove excessive whitespace
-    text = re.sub(r"\s+", " ", text)
+    # Already-clean text (most splitter chunks) would come back unchanged: it has
+    # no control characters or whitespace other than single inner spaces.
+    # isprintable() and the substring test are C scans, far cheaper than cleaning.
+    if text.isprintable() and "  " not in text and text[:1] != " " and text[-1:] != " ":
+        return text
 
-    # Remove control characters except newlines
-    text = re.sub(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]", "", text)
+    # Remove control characters first so that no space is left stranded
+    # beside one, and the collapse below produces the final string
+    text = text.translate(_CTRL_TABLE) if text.isascii() else _CTRL_RE.sub("", text)
 
-    # Normalize line endings
-    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    # Collapse every whitespace run, newlines and \r included, to one space
+    # (split/join runs in C, no regex engine). No line breaks survive this, so
+    # no separate line-ending or blank-line passes are needed, and split()
+    # drops leading and trailing whitespace, so no strip() is needed either.
+    return " ".join(text.split())
 
-    # Remove excessive newlines (more than 2 consecutive)
-    text = re.sub(r"\n{3,}", "\n\n", text)
 
-    return text.strip()
+def clean_text_bytes(data: bytes) -> str:
+    """Clean raw UTF-8 bytes, stripping control bytes before decoding."""
+    # bytes.translate deletes at one byte per character, before the decoded
+    # string can widen to a multi-byte representation
+    text = data.translate(None, _CTRL_BYTES).decode("utf-8", errors="ignore")
+    return " ".join(text.split())
 
 
 def generate_preview(text: str, max_length: int = 500) -> str:
@@ -30,25 +53,75 @@ def generate_preview(text: str, max_length: int = 500) -> str:
     if len(cleaned) <= max_length:
         return cleaned
 
-    # Try to cut at a sentence boundary
+    # Try to cut at a sentence boundary (cleaned text has no newlines, so a
+    # period is the only boundary worth scanning for)
     preview = cleaned[:max_length]
-    last_period = preview.rfind(".")
-    last_newline = preview.rfind("\n")
-
-    cut_point = max(last_period, last_newline)
-    if cut_point > max_length // 2:
-        preview = preview[: cut_point + 1]
+    head, period, _ = preview.rpartition(".")
+    if len(head) > max_length // 2:
+        preview = head + period
     else:
         # Cut at word boundary
-        last_space = preview.rfind(" ")
-        if last_space > max_length // 2:
-            preview = preview[:last_space]
+        head, _, _ = preview.rpartition(" ")
+        if len(head) > max_length // 2:
+            preview = head
 
     return preview.strip() + "..."
 
 
-def chunk_text(text: str, chunk_size: int = None, chunk_overlap: int = None) -> list[str]:
+# Separators tried by the splitter, coarsest first; "" always applies
+_SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+
+@lru_cache(maxsize=32)
+def _get_splitter(
+    chunk_size: int, chunk_overlap: int, separators: tuple[str, ...] = (*_SEPARATORS, "")
+) -> RecursiveCharacterTextSplitter:
+    """Get a text splitter for the given sizes, built once and reused."""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=list(separators),
+    )
+
+
+def _separators_for(text: str) -> tuple[str, ...]:
+    """Return the separators that actually occur in text."""
+    # A separator missing from the whole text is missing from every piece of
+    # it too, so dropping it leaves the split unchanged and skips its scans
+    return (*(sep for sep in _SEPARATORS if sep in text), "")
+
+
+def iter_chunks(
+    text: str, chunk_size: int = None, chunk_overlap: int = None, pre_cleaned: bool = False
+) -> Iterator[str]:
+    """Yield cleaned chunks of text for embedding and retrieval."""
+    if chunk_size is None or chunk_overlap is None:
+        settings = get_settings()
+        if chunk_size is None:
+            chunk_size = settings.chunk_size
+        if chunk_overlap is None:
+            chunk_overlap = settings.chunk_overlap
+
+    chunks = _get_splitter(chunk_size, chunk_overlap, _separators_for(text)).split_text(text)
+    # Chunks of text that already went through clean_text only need stripping;
+    # either way each chunk is processed once and empty results are dropped
+    for chunk in map(str.strip if pre_cleaned else clean_text, chunks):
+        if chunk:
+            yield chunk
+
+
+def chunk_text(
+    text: str, chunk_size: int = None, chunk_overlap: int = None, pre_cleaned: bool = False
+) -> list[str]:
     """Split text into chunks for embedding and retrieval."""
+    return list(iter_chunks(text, chunk_size, chunk_overlap, pre_cleaned))
+
+
+def chunk_texts(
+    texts: list[str], chunk_size: int = None, chunk_overlap: int = None, pre_cleaned: bool = False
+) -> tuple[list[int], list[str]]:
+    """Split several texts at once into parallel lists of source index and chunk."""
     settings = get_settings()
 
     if chunk_size is None:
@@ -56,12 +129,13 @@ def chunk_text(text: str, chunk_size: int = None, chunk_overlap: int = None) ->
     if chunk_overlap is None:
         chunk_overlap = settings.chunk_overlap
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        length_function=len,
-        separators=["\n\n", "\n", ". ", " ", ""],
-    )
+    # Flat chunk list ready for one embedding batch; text_ids maps each back.
+    # Sizes are resolved once above, so iter_chunks skips the settings lookup.
+    text_ids: list[int] = []
+    chunks: list[str] = []
+    for text_id, text in enumerate(texts):
+        for chunk in iter_chunks(text, chunk_size, chunk_overlap, pre_cleaned):
+            text_ids.append(text_id)
+            chunks.append(chunk)
 
-    chunks = text_splitter.split_text(text)
-    return [clean_text(chunk) for chunk in chunks if chunk.strip()]
+    return text_ids, chunks